@@ -16,11 +16,12 @@
 """
 import string
 from collections import OrderedDict, defaultdict
+from functools import lru_cache
 
 import xarray as xr
 from hypothesis.extra.numpy import arrays, order_check
 from hypothesis.internal.validation import check_valid_bound
-from hypothesis.strategies import fixed_dictionaries, floats, integers, lists, nothing, sampled_from, text, tuples
+from hypothesis.strategies import composite, fixed_dictionaries, floats, integers, lists, nothing, sampled_from, text
 
 DEFAULT_DTYPE = int
 DEFAULT_SIDE = 5
@@ -39,24 +40,64 @@ def _check_valid_size_interval(min_size, max_size, name, floor=0):
         order_check(name, floor, min_size, max_size)
 
 
+# These strategies are immutable, so build them once at import and share them across calls
+_EASY_TEXT = text(alphabet=string.ascii_lowercase, min_size=0, max_size=5)
+_HASHABLE = floats() | integers() | _EASY_TEXT
+
+
 def _easy_text():
-    return text(alphabet=string.ascii_lowercase, min_size=0, max_size=5)
+    return _EASY_TEXT
 
 
 def _hashable():
-    S = floats() | integers() | _easy_text()
-    return S
+    return _HASHABLE
 
 
 def _get_all_dims(vars_to_dims):
-    all_dims = sorted(set(sum((list(dd) for dd in vars_to_dims.values()), [])))
+    all_dims = sorted({dd for dims in vars_to_dims.values() for dd in dims})
     return all_dims
 
 
+@lru_cache(maxsize=256)
+def _memo_arrays(dtype, shape, elements):
+    S = arrays(dtype, shape, elements=elements)
+    return S
+
+
+def _cached_arrays(dtype, shape, elements):
+    """Memoized version of `arrays` so data strategies are shared across draws with the same shape.
+
+    Arguments that can not be hashed, like structured dtypes given as a `list` or `dict`, or `elements` given as a
+    `dict` of kwargs for `from_dtype`, skip the cache.
+    """
+    try:
+        hash((dtype, elements))
+    except TypeError:
+        S = arrays(dtype, shape, elements=elements)
+        return S
+    S = _memo_arrays(dtype, shape, elements)
+    return S
+
+
 xr_dims = _easy_text
 xr_vars = _hashable
 
 
+def _subset_lists_unchecked(L, min_size=0, max_size=None, uniq_len=None):
+    """Version of `subset_lists` that skips input validation, for internal callers that already guarantee valid sizes.
+
+    If `uniq_len` is not given, the elements of `L` are trusted to be unique.
+    """
+    uniq_len = len(L) if uniq_len is None else uniq_len
+    max_size = uniq_len if max_size is None else min(uniq_len, max_size)
+
+    # Avoid deprecation warning HypothesisDeprecationWarning: sampled_from()
+    elements_st = nothing() if uniq_len == 0 else sampled_from(L)
+
+    S = lists(elements=elements_st, min_size=min_size, max_size=max_size, unique=True)
+    return S
+
+
 def subset_lists(L, min_size=0, max_size=None):
     """Strategy to generate a subset of a `list`.
 
@@ -80,12 +121,7 @@ def subset_lists(L, min_size=0, max_size=None):
     uniq_len = len(set(L))
     order_check("input list size", 0, min_size, uniq_len)
 
-    max_size = uniq_len if max_size is None else min(uniq_len, max_size)
-
-    # Avoid deprecation warning HypothesisDeprecationWarning: sampled_from()
-    elements_st = nothing() if uniq_len == 0 else sampled_from(L)
-
-    S = lists(elements=elements_st, min_size=min_size, max_size=max_size, unique=True)
+    S = _subset_lists_unchecked(L, min_size, max_size, uniq_len)
     return S
 
 
@@ -129,20 +165,30 @@ def xr_var_lists(min_vars=0, max_vars=DEFAULT_VARS):
     return S
 
 
-def _vars_and_dims_pairs(min_vars=0, max_vars=DEFAULT_VARS, min_dims=0, max_dims=DEFAULT_DIMS):
+@composite
+def _vars_and_dims_pairs(draw, min_vars=0, max_vars=DEFAULT_VARS, min_dims=0, max_dims=DEFAULT_DIMS):
     """Generate both variable and dimension names.
 
     xarray requires that there are no name collisions between the two.
     """
+    vars_ = draw(xr_var_lists(min_vars, max_vars))
+    # Dataset does not allow the same names for variable and dimensions, so only keep dims disjoint from the vars
+    vars_set = set(vars_)
+    dims = draw(xr_dim_lists(min_dims, max_dims).filter(vars_set.isdisjoint))
+    return vars_, dims
 
-    def no_overlap(args):
-        vars_, dims = args
-        # Dataset does not allow the same names for variable and dimensions, so we filter by looking at intersection
-        ok = len(set(dims).intersection(vars_)) == 0
-        return ok
 
-    S = tuples(xr_var_lists(min_vars, max_vars), xr_dim_lists(min_dims, max_dims)).filter(no_overlap)
-    return S
+@composite
+def _vars_to_dims_dicts(draw, min_vars, max_vars, min_dims, max_dims):
+    """Draw the variables and dimensions, and then a subset of the dimensions for each variable, in a single step."""
+    vars_, dims = draw(_vars_and_dims_pairs(min_vars, max_vars, min_dims, max_dims))
+
+    # dims are unique and of at least min_dims length by construction, so we can skip the checks in subset_lists
+    dim_st = _subset_lists_unchecked(dims, min_size=min_dims, max_size=max_dims)
+    D = OrderedDict()
+    for vv in vars_:
+        D[vv] = draw(dim_st)
+    return D
 
 
 def vars_to_dims_dicts(min_vars=0, max_vars=DEFAULT_VARS, min_dims=0, max_dims=DEFAULT_DIMS):
@@ -169,13 +215,7 @@ def vars_to_dims_dicts(min_vars=0, max_vars=DEFAULT_VARS, min_dims=0, max_dims=D
     _check_valid_size_interval(min_vars, max_vars, "variables")
     _check_valid_size_interval(min_dims, max_dims, "dimensions")
 
-    def map_dict(args):
-        vars_, dims = args
-        dim_st = subset_lists(dims, min_size=min_dims, max_size=max_dims)
-        S = fixed_dictionaries(OrderedDict([(vv, dim_st) for vv in vars_]))
-        return S
-
-    S = _vars_and_dims_pairs(min_vars, max_vars, min_dims, max_dims).flatmap(map_dict)
+    S = _vars_to_dims_dicts(min_vars, max_vars, min_dims, max_dims)
     return S
 
 
@@ -229,11 +269,11 @@ def simple_coords(min_side=0, max_side=DEFAULT_SIDE):
     _check_valid_size_interval(min_side, max_side, "side")
 
     n = integers(min_value=min_side, max_value=max_side)
-    S = n.map(range).map(list)  # Always make list to be consistent with xr_coords
+    S = n.map(lambda k: list(range(k)))  # Always make list to be consistent with xr_coords
     return S
 
 
-def xr_coords_dicts(dims, elements=None, min_side=0, max_side=DEFAULT_SIDE, unique_coords=True, coords_st={}):
+def xr_coords_dicts(dims, elements=None, min_side=0, max_side=DEFAULT_SIDE, unique_coords=True, coords_st=None):
     """Build a dictionary of coordinates for the purpose of building a :class:`xarray:xarray.DataArray`.
 
     `xarray` allows some dims to not have any specified coordinate. This strategy assigns a coord to every dimension. If
@@ -252,7 +292,7 @@ def xr_coords_dicts(dims, elements=None, min_side=0, max_side=DEFAULT_SIDE, uniq
         Maximum length of coordinates array.
     unique_coords : bool
         If all coordinate values should be unique. `xarray` allows non-unique values, but it makes no sense.
-    coords_st : dict(str, SearchStrategy)
+    coords_st : dict(str, SearchStrategy) or None
         Special strategies for filling specific dimensions. Use the dimension name as the key and the strategy for
         generating the coordinate as the value.
 
@@ -264,7 +304,10 @@ def xr_coords_dicts(dims, elements=None, min_side=0, max_side=DEFAULT_SIDE, uniq
     _check_valid_size_interval(min_side, max_side, "side")
 
     default_st = xr_coords(elements=elements, min_side=min_side, max_side=max_side, unique=unique_coords)
-    C = OrderedDict([(dd, coords_st.get(dd, default_st)) for dd in dims])
+    if coords_st:
+        C = OrderedDict([(dd, coords_st.get(dd, default_st)) for dd in dims])
+    else:
+        C = OrderedDict([(dd, default_st) for dd in dims])
     S = fixed_dictionaries(C)
     return S
 
@@ -291,15 +334,15 @@ def fixed_coords_dataarrays(dims, coords, dtype=DEFAULT_DTYPE, elements=None):
         :class:`xarray:xarray.DataArray` generated with the specified coordinates and elements from the specified
         strategy.
     """
-    shape = [len(coords[dd]) for dd in dims]
-    data_st = arrays(dtype, shape, elements=elements)
-    coords = {dd: cc for dd, cc in coords.items() if dd in dims}
+    shape = tuple(len(coords[dd]) for dd in dims)
+    data_st = _cached_arrays(dtype, shape, elements)
+    coords = {dd: coords[dd] for dd in dims}
     S = data_st.map(lambda data: xr.DataArray(data, coords=coords, dims=dims))
     return S
 
 
 def fixed_dataarrays(
-    dims, dtype=DEFAULT_DTYPE, elements=None, coords_elements=None, min_side=0, max_side=DEFAULT_SIDE, coords_st={}
+    dims, dtype=DEFAULT_DTYPE, elements=None, coords_elements=None, min_side=0, max_side=DEFAULT_SIDE, coords_st=None
 ):
     """Generate :class:`xarray:xarray.DataArray` with dimensions (but not coordinates) that are fixed a-priori.
 
@@ -319,7 +362,7 @@ def fixed_dataarrays(
         Minimum side length of the :class:`xarray:xarray.DataArray`.
     max_side : int or None
         Maximum side length of the :class:`xarray:xarray.DataArray`.
-    coords_st : dict(str, SearchStrategy)
+    coords_st : dict(str, SearchStrategy) or None
         Special strategies for filling specific dimensions. Use the dimension name as the key and the strategy for
         generating the coordinate as the value.
 
@@ -440,8 +483,9 @@ def fixed_coords_datasets(vars_to_dims, coords, dtype=None, elements=None):
     ds : :class:`xarray:xarray.Dataset`
         :class:`xarray:xarray.Dataset` with the specified variables, dimensions, and coordinates.
     """
+    # Plain dict of the default, rather than building a new defaultdict (and lambda) on every call
     if dtype is None:
-        dtype = defaultdict(lambda: DEFAULT_DTYPE)
+        dtype = {vv: DEFAULT_DTYPE for vv in vars_to_dims}
 
     C = OrderedDict([(vv, fixed_coords_dataarrays(dd, coords, dtype[vv], elements)) for vv, dd in vars_to_dims.items()])
     data_st = fixed_dictionaries(C)
@@ -450,7 +494,7 @@ def fixed_coords_datasets(vars_to_dims, coords, dtype=None, elements=None):
 
 
 def fixed_datasets(
-    vars_to_dims, dtype=None, elements=None, coords_elements=None, min_side=0, max_side=DEFAULT_SIDE, coords_st={}
+    vars_to_dims, dtype=None, elements=None, coords_elements=None, min_side=0, max_side=DEFAULT_SIDE, coords_st=None
 ):
     """Generate :class:`xarray:xarray.Dataset` where the variables and dimensions (but not coordinates) are specified
     a-priori.
@@ -471,7 +515,7 @@ def fixed_datasets(
         Minimum side length of the :class:`xarray:xarray.Dataset`.
     max_side : int or None
         Maximum side length of the :class:`xarray:xarray.Dataset`.
-    coords_st : dict(str, SearchStrategy)
+    coords_st : dict(str, SearchStrategy) or None
         Special strategies for filling specific dimensions. Use the dimension name as the key and the strategy for
         generating the coordinate as the value.
 
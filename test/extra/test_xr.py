@@ -11,9 +11,12 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+from functools import lru_cache
+from itertools import chain
+
 import numpy as np
 import xarray as xr
-from hypothesis import assume, given
+from hypothesis import Phase, assume, given, settings
 from hypothesis.extra.numpy import scalar_dtypes
 from hypothesis.strategies import booleans, data, fixed_dictionaries, integers, just, lists, one_of, tuples
 
@@ -36,35 +39,73 @@ def sizes(allow_none=True):
     return S
 
 
-def dtypes():
-    def to_native(dtype):
-        tt = dtype.type
-        # Only keep if invertible
-        tt = tt if np.dtype(tt) == dtype else dtype
-        return tt
+def _to_native(dtype):
+    tt = dtype.type
+    # Only keep if invertible
+    tt = tt if np.dtype(tt) == dtype else dtype
+    return tt
 
-    def cast_it(args):
-        return args[0](args[1])
 
+def dtypes():
     dtypes = scalar_dtypes().filter(lambda x: x.kind in "biuf")
-    return one_of(dtypes, dtypes.map(str), dtypes.map(to_native))
+    return one_of(dtypes, dtypes.map(str), dtypes.map(_to_native))
+
+
+# Build the strategies shared by the tests once rather than in every decorator
+_HASHABLE_LIST = lists(_hashable())
+_DIMS = hxr.xr_dim_lists()
+_VARS_TO_DIMS = hxr.vars_to_dims_dicts()
+_SIZES = sizes()
+_SIZES_NO_NONE = sizes(allow_none=False)
+_DTYPES = dtypes()
+
+# Zeros of shape (1,) * n indexed by n, for tests that only check dims. Read-only broadcast views avoid allocating a
+# new array (and shape tuple) in every example.
+_ZEROS = tuple(np.broadcast_to(np.int8(0), (1,) * n) for n in range(MAX_DIM_LEN + 1))
+
+# These tests only check invariants the strategies satisfy by construction, so a small budget without shrinking will do
+_SCHEMA_SETTINGS = settings(max_examples=25, deadline=None, phases=(Phase.explicit, Phase.reuse, Phase.generate))
+
+
+def _coord_values(obj, name):
+    # Go through the coord variables so we do not build a whole new DataArray just to read the coordinate values
+    X = obj.coords.variables[name].values
+    return X
+
 
+def _is_int_array(X):
+    # Ints that overflow int64 give an object array, and empty coords come back as float, so check those elementwise
+    ok = X.dtype.kind in "iu" or all(type(ss) is int for ss in X.tolist())
+    return ok
 
-@given(hxr.xr_dim_lists(), data())
+
+@lru_cache(maxsize=4096)
+def _const_lists(value, min_size, max_size):
+    # The same (dim, sizes) combinations come up repeatedly across examples, so share the strategies
+    S = lists(just(value), min_size=min_size, max_size=max_size)
+    return S
+
+
+@lru_cache(maxsize=2048)
+def _subset_lists(dims):
+    # dims must be a tuple to be hashable, examples (and shrinking) often repeat the same dims
+    S = hxr.subset_lists(list(dims))
+    return S
+
+
+@_SCHEMA_SETTINGS
+@given(_DIMS, data())
 def test_get_all_dims(dims, data):
     vars_to_dims = data.draw(hxr.xr_coords_dicts(dims))
 
     all_dims = hxr._get_all_dims(vars_to_dims)
 
-    assert all_dims == sorted(set(all_dims))
+    # Strictly increasing means both sorted and unique
+    assert all(aa < bb for aa, bb in zip(all_dims, all_dims[1:]))
+    assert set(all_dims) == set().union(*vars_to_dims.values())
 
-    all_dims2 = []
-    for dd in vars_to_dims.values():
-        all_dims2.extend(dd)
-    assert all_dims == sorted(set(all_dims2))
 
-
-@given(lists(_hashable()), sizes(), data())
+@given(_HASHABLE_LIST, _SIZES, data())
 def test_subset_lists(L, sizes, data):
     min_size, max_size = sizes
 
@@ -80,7 +121,8 @@ def test_subset_lists(L, sizes, data):
     assert set(L2).issubset(set(L))
 
 
-@given(lists(_hashable()), sizes(), data())
+@_SCHEMA_SETTINGS
+@given(_HASHABLE_LIST, _SIZES, data())
 def test_subset_lists_empty(L, sizes, data):
     min_size, max_size = sizes
 
@@ -91,7 +133,8 @@ def test_subset_lists_empty(L, sizes, data):
     assert L2 == []
 
 
-@given(sizes(), data())
+@_SCHEMA_SETTINGS
+@given(_SIZES, data())
 def test_xr_dim_lists(sizes, data):
     min_dims, max_dims = sizes
 
@@ -102,14 +145,16 @@ def test_xr_dim_lists(sizes, data):
     n = len(L)
     assert n >= min_dims
     assert (max_dims is None) or (n <= max_dims)
-    assert all(isinstance(ss, str) for ss in L)
+    assert all(type(ss) is str for ss in L)
 
     if n <= MAX_DIM_LEN:
-        da = xr.DataArray(np.zeros((1,) * n), dims=L)
-        assert da.dims == tuple(L)
+        # Variable is enough to check xarray accepts the dims, without the coord setup of a full DataArray
+        var = xr.Variable(L, _ZEROS[n])
+        assert var.dims == tuple(L)
 
 
-@given(sizes(), data())
+@_SCHEMA_SETTINGS
+@given(_SIZES, data())
 def test_xr_var_lists(sizes, data):
     min_vars, max_vars = sizes
 
@@ -120,13 +165,13 @@ def test_xr_var_lists(sizes, data):
     n = len(L)
     assert n >= min_vars
     assert (max_vars is None) or (n <= max_vars)
-    assert all(isinstance(hash(ss), int) for ss in L)
+    assert all(type(hash(ss)) is int for ss in L)
 
-    ds = xr.Dataset({vv: xr.DataArray(0) for vv in L})
+    ds = xr.Dataset({vv: ((), 0) for vv in L})
     assert set(ds) == set(L)
 
 
-@given(sizes(), sizes(), data())
+@given(_SIZES, _SIZES, data())
 def test_vars_to_dims_dicts(var_sizes, dim_sizes, data):
     min_vars, max_vars = var_sizes
     min_dims, max_dims = dim_sizes
@@ -140,15 +185,17 @@ def test_vars_to_dims_dicts(var_sizes, dim_sizes, data):
     assert (max_vars is None) or (n <= max_vars)
     assert all(len(dd) >= min_dims for _, dd in D.items())
     assert (max_dims is None) or all(len(dd) <= max_dims for _, dd in D.items())
-    assert all(all(isinstance(ss, str) for ss in dd) for _, dd in D.items())
+    assert all(all(type(ss) is str for ss in dd) for _, dd in D.items())
 
     if all(len(dd) <= MAX_DIM_LEN for _, dd in D.items()):
-        ds = xr.Dataset({vv: xr.DataArray(np.zeros((1,) * len(dd)), dims=dd) for vv, dd in D.items()})
+        ds = xr.Dataset({vv: (tuple(dd), _ZEROS[len(dd)]) for vv, dd in D.items()})
+        variables = ds.variables
         assert set(ds) == set(D.keys())
-        assert all(ds[vv].dims == tuple(dd) for vv, dd in D.items())
+        assert all(variables[vv].dims == tuple(dd) for vv, dd in D.items())
 
 
-@given(sizes(), booleans(), data())
+@_SCHEMA_SETTINGS
+@given(_SIZES, booleans(), data())
 def test_xr_coords(sizes, unique, data):
     elements = None
     min_side, max_side = sizes
@@ -160,13 +207,14 @@ def test_xr_coords(sizes, unique, data):
     n = len(L)
     assert n >= min_side
     assert (max_side is None) or (n <= max_side)
-    assert all(isinstance(ss, int) for ss in L)
+    assert all(type(ss) is int for ss in L)
 
     if unique:
         assert len(set(L)) == len(L)
 
 
-@given(sizes(allow_none=False), data())
+@_SCHEMA_SETTINGS
+@given(_SIZES_NO_NONE, data())
 def test_simple_coords(sizes, data):
     min_side, max_side = sizes
 
@@ -177,35 +225,37 @@ def test_simple_coords(sizes, data):
     n = len(L)
     assert n >= min_side
     assert (max_side is None) or (n <= max_side)
-    assert all(isinstance(ss, int) for ss in L)
+    assert all(type(ss) is int for ss in L)
     assert L == list(range(len(L)))
 
 
-@given(hxr.xr_dim_lists(), sizes(), booleans(), data())
+@_SCHEMA_SETTINGS
+@given(_DIMS, _SIZES, booleans(), data())
 def test_xr_coords_dicts(dims, sizes, unique_coords, data):
     elements = None
     min_side, max_side = sizes
 
     # special dims just filled with dim name on coords as test case
-    special_dims = data.draw(hxr.subset_lists(dims))
-    coords_st = {dd: lists(just(dd), min_side, max_side) for dd in special_dims}
+    special_dims = data.draw(_subset_lists(tuple(dims)))
+    special_set = frozenset(special_dims)
+    coords_st = {dd: _const_lists(dd, min_side, max_side) for dd in special_dims}
 
     S = hxr.xr_coords_dicts(dims, elements, min_side, max_side, unique_coords, coords_st)
 
     D = data.draw(S)
 
     assert list(D.keys()) == dims
-    assert all(min_side <= len(cc) for cc in D.values())
-    assert (max_side is None) or all(max_side >= len(cc) for cc in D.values())
-    assert all((dd in special_dims) or all(isinstance(ss, int) for ss in L) for dd, L in D.items())
-    assert all(all(ss == dd for ss in D[dd]) for dd in special_dims)
-
-    if unique_coords:
-        for dd, cc in D.items():
-            assert (dd in special_dims) or (len(set(cc)) == len(cc))
+    for dd, L in D.items():
+        assert min_side <= len(L)
+        assert (max_side is None) or (len(L) <= max_side)
+        if dd in special_set:
+            assert all(ss == dd for ss in L)
+        else:
+            assert all(type(ss) is int for ss in L)
+            assert (not unique_coords) or (len(set(L)) == len(L))
 
 
-@given(hxr.xr_dim_lists(), dtypes(), data())
+@given(_DIMS, _DTYPES, data())
 def test_fixed_coords_dataarrays(dims, dtype, data):
     elements = None
 
@@ -218,35 +268,59 @@ def test_fixed_coords_dataarrays(dims, dtype, data):
     assert da.dims == tuple(dims)
     assert da.dtype == np.dtype(dtype)
     for dd in dims:
-        assert da.coords[dd].values.tolist() == coords[dd]
+        X = _coord_values(da, dd)
+        assert np.array_equal(X, np.asarray(coords[dd]))
+
+
+@given(data())
+def test_fixed_coords_dataarrays_unhashable_args(data):
+    # Structured dtypes and elements kwargs for from_dtype are valid for arrays, but can not be hashed
+    dtype = [("a", "i4"), ("b", "f8")]
+    elements = {"allow_nan": False}
+
+    S = hxr.fixed_coords_dataarrays(["x"], {"x": [0, 1]}, dtype, elements)
+
+    da = data.draw(S)
+
+    assert da.dims == ("x",)
+    assert da.dtype == np.dtype(dtype)
+
+    S = hxr.fixed_coords_dataarrays(["x"], {"x": [0, 1]}, {"names": ["a", "b"], "formats": ["i4", "f8"]})
 
+    da = data.draw(S)
+
+    assert da.dtype == np.dtype(dtype)
 
-@given(hxr.xr_dim_lists(), dtypes(), sizes(), data())
+
+@given(_DIMS, _DTYPES, _SIZES, data())
 def test_fixed_dataarrays(dims, dtype, sizes, data):
     elements = None
     coords_elements = None
     min_side, max_side = sizes
 
     # special dims just filled with dim name on coords as test case
-    special_dims = data.draw(hxr.subset_lists(dims))
-    coords_st = {dd: lists(just(dd), min_side, max_side) for dd in special_dims}
+    special_dims = data.draw(_subset_lists(tuple(dims)))
+    special_set = frozenset(special_dims)
+    coords_st = {dd: _const_lists(dd, min_side, max_side) for dd in special_dims}
 
     S = hxr.fixed_dataarrays(dims, dtype, elements, coords_elements, min_side, max_side, coords_st)
 
     da = data.draw(S)
 
     assert da.dims == tuple(dims)
-    assert all(ss >= min_side for ss in da.sizes.values())
-    assert (max_side is None) or all(ss <= max_side for ss in da.sizes.values())
     assert da.dtype == np.dtype(dtype)
-    assert all(all(ss == dd for ss in da.coords[dd].values.tolist()) for dd in special_dims)
     for dd in dims:
-        L = da.coords[dd].values.tolist()
-        assert (dd in special_dims) or all(isinstance(ss, int) for ss in L)
-        assert (dd in special_dims) or (len(set(L)) == len(L))
+        X = _coord_values(da, dd)
+        assert len(X) >= min_side
+        assert (max_side is None) or (len(X) <= max_side)
+        if dd in special_set:
+            assert all(ss == dd for ss in X.tolist())
+        else:
+            assert _is_int_array(X)
+            assert np.unique(X).size == X.size
 
 
-@given(hxr.xr_dim_lists(), dtypes(), sizes(allow_none=False), data())
+@given(_DIMS, _DTYPES, _SIZES_NO_NONE, data())
 def test_simple_dataarrays(dims, dtype, sizes, data):
     elements = None
     min_side, max_side = sizes
@@ -256,16 +330,16 @@ def test_simple_dataarrays(dims, dtype, sizes, data):
     da = data.draw(S)
 
     assert da.dims == tuple(dims)
-    assert all(ss >= min_side for ss in da.sizes.values())
-    assert (max_side is None) or all(ss <= max_side for ss in da.sizes.values())
     assert da.dtype == np.dtype(dtype)
     for dd in dims:
-        L = da.coords[dd].values.tolist()
-        assert all(isinstance(ss, int) for ss in L)
-        assert L == list(range(len(L)))
+        X = _coord_values(da, dd)
+        assert len(X) >= min_side
+        assert (max_side is None) or (len(X) <= max_side)
+        assert _is_int_array(X)
+        assert np.array_equal(X, np.arange(len(X)))
 
 
-@given(dtypes(), sizes(allow_none=False), sizes(allow_none=False), data())
+@given(_DTYPES, _SIZES_NO_NONE, _SIZES_NO_NONE, data())
 def test_dataarrays(dtype, size_dims, size_sides, data):
     elements = None
     coords_elements = None
@@ -279,109 +353,120 @@ def test_dataarrays(dtype, size_dims, size_sides, data):
 
     assert len(da.dims) >= min_dims
     assert len(da.dims) <= max_dims
-    assert all(ss >= min_side for ss in da.sizes.values())
-    assert (max_side is None) or all(ss <= max_side for ss in da.sizes.values())
     assert da.dtype == np.dtype(dtype)
     for dd in da.dims:
-        L = da.coords[dd].values.tolist()
-        assert all(isinstance(ss, int) for ss in L)
-        assert len(set(L)) == len(L)
+        X = _coord_values(da, dd)
+        assert len(X) >= min_side
+        assert (max_side is None) or (len(X) <= max_side)
+        assert _is_int_array(X)
+        assert np.unique(X).size == X.size
 
 
-@given(hxr.vars_to_dims_dicts(), data())
+@given(_VARS_TO_DIMS, data())
 def test_fixed_coords_datasets(vars_to_dims, data):
     elements = None
 
-    all_dims = sorted(set(sum((list(dd) for dd in vars_to_dims.values()), [])))
+    all_dims = sorted(set(chain.from_iterable(vars_to_dims.values())))
     coords = data.draw(hxr.xr_coords_dicts(all_dims))
 
-    dtype_d = data.draw(fixed_dictionaries({vv: dtypes() for vv in vars_to_dims}))
+    dtype_d = data.draw(fixed_dictionaries({vv: _DTYPES for vv in vars_to_dims}))
 
     S = hxr.fixed_coords_datasets(vars_to_dims, coords, dtype_d, elements)
 
     ds = data.draw(S)
 
+    variables = ds.variables
     assert list(ds) == list(vars_to_dims.keys())
-    assert all(ds[vv].dims == tuple(vars_to_dims[vv]) for vv in vars_to_dims)
-    assert all(ds[vv].dtype == np.dtype(dtype_d[vv]) for vv in vars_to_dims)
+    assert all(variables[vv].dims == tuple(vars_to_dims[vv]) for vv in vars_to_dims)
+    expected_dtype = {vv: np.dtype(dtype_d[vv]) for vv in vars_to_dims}
+    assert all(variables[vv].dtype == expected_dtype[vv] for vv in vars_to_dims)
     for dd in all_dims:
-        L = ds.coords[dd].values.tolist()
-        assert L == coords[dd]
+        X = _coord_values(ds, dd)
+        assert np.array_equal(X, np.asarray(coords[dd]))
 
 
-@given(hxr.vars_to_dims_dicts(), data())
+@given(_VARS_TO_DIMS, data())
 def test_fixed_coords_datasets_no_dtype(vars_to_dims, data):
     elements = None
 
-    all_dims = sorted(set(sum((list(dd) for dd in vars_to_dims.values()), [])))
+    all_dims = sorted(set(chain.from_iterable(vars_to_dims.values())))
     coords = data.draw(hxr.xr_coords_dicts(all_dims))
 
     S = hxr.fixed_coords_datasets(vars_to_dims, coords, dtype=None, elements=elements)
 
     ds = data.draw(S)
 
+    variables = ds.variables
     assert list(ds) == list(vars_to_dims.keys())
-    assert all(ds[vv].dims == tuple(vars_to_dims[vv]) for vv in vars_to_dims)
-    assert all(ds[vv].dtype == np.dtype(hxr.DEFAULT_DTYPE) for vv in vars_to_dims)
+    assert all(variables[vv].dims == tuple(vars_to_dims[vv]) for vv in vars_to_dims)
+    expected_dtype = np.dtype(hxr.DEFAULT_DTYPE)
+    assert all(variables[vv].dtype == expected_dtype for vv in vars_to_dims)
     for dd in all_dims:
-        L = ds.coords[dd].values.tolist()
-        assert L == coords[dd]
+        X = _coord_values(ds, dd)
+        assert np.array_equal(X, np.asarray(coords[dd]))
 
 
-@given(hxr.vars_to_dims_dicts(), sizes(), data())
+@given(_VARS_TO_DIMS, _SIZES, data())
 def test_fixed_datasets(vars_to_dims, sizes, data):
     elements = None
     coords_elements = None
     min_side, max_side = sizes
 
     # special dims just filled with dim name on coords as test case
-    all_dims = sorted(set(sum((list(dd) for dd in vars_to_dims.values()), [])))
-    special_dims = data.draw(hxr.subset_lists(all_dims))
-    coords_st = {dd: lists(just(dd), min_side, max_side) for dd in special_dims}
+    all_dims = sorted(set(chain.from_iterable(vars_to_dims.values())))
+    special_dims = data.draw(_subset_lists(tuple(all_dims)))
+    special_set = frozenset(special_dims)
+    coords_st = {dd: _const_lists(dd, min_side, max_side) for dd in special_dims}
 
-    dtype_d = data.draw(fixed_dictionaries({vv: dtypes() for vv in vars_to_dims}))
+    dtype_d = data.draw(fixed_dictionaries({vv: _DTYPES for vv in vars_to_dims}))
 
     S = hxr.fixed_datasets(vars_to_dims, dtype_d, elements, coords_elements, min_side, max_side, coords_st)
 
     ds = data.draw(S)
 
+    variables = ds.variables
     assert list(ds) == list(vars_to_dims.keys())
-    assert all(ds[vv].dims == tuple(vars_to_dims[vv]) for vv in vars_to_dims)
-    assert all(ds[vv].dtype == np.dtype(dtype_d[vv]) for vv in vars_to_dims)
-    assert all(all(ss == dd for ss in ds.coords[dd].values.tolist()) for dd in special_dims)
+    assert all(variables[vv].dims == tuple(vars_to_dims[vv]) for vv in vars_to_dims)
+    expected_dtype = {vv: np.dtype(dtype_d[vv]) for vv in vars_to_dims}
+    assert all(variables[vv].dtype == expected_dtype[vv] for vv in vars_to_dims)
     for dd in all_dims:
-        L = ds.coords[dd].values.tolist()
-        assert len(L) >= min_side
-        assert (max_side is None) or (len(L) <= max_side)
-        assert (dd in special_dims) or all(isinstance(ss, int) for ss in L)
-        assert (dd in special_dims) or len(set(L)) == len(L)
+        X = _coord_values(ds, dd)
+        assert len(X) >= min_side
+        assert (max_side is None) or (len(X) <= max_side)
+        if dd in special_set:
+            assert all(ss == dd for ss in X.tolist())
+        else:
+            assert _is_int_array(X)
+            assert np.unique(X).size == X.size
 
 
-@given(hxr.vars_to_dims_dicts(), sizes(allow_none=False), data())
+@given(_VARS_TO_DIMS, _SIZES_NO_NONE, data())
 def test_simple_datasets(vars_to_dims, sizes, data):
     elements = None
     min_side, max_side = sizes
 
-    dtype_d = data.draw(fixed_dictionaries({vv: dtypes() for vv in vars_to_dims}))
+    dtype_d = data.draw(fixed_dictionaries({vv: _DTYPES for vv in vars_to_dims}))
 
     S = hxr.simple_datasets(vars_to_dims, dtype_d, elements, min_side, max_side)
 
     ds = data.draw(S)
 
-    all_dims = sorted(set(sum((list(dd) for dd in vars_to_dims.values()), [])))
+    all_dims = sorted(set(chain.from_iterable(vars_to_dims.values())))
 
+    variables = ds.variables
     assert list(ds) == list(vars_to_dims.keys())
-    assert all(ds[vv].dims == tuple(vars_to_dims[vv]) for vv in vars_to_dims)
-    assert all(ds[vv].dtype == np.dtype(dtype_d[vv]) for vv in vars_to_dims)
+    assert all(variables[vv].dims == tuple(vars_to_dims[vv]) for vv in vars_to_dims)
+    expected_dtype = {vv: np.dtype(dtype_d[vv]) for vv in vars_to_dims}
+    assert all(variables[vv].dtype == expected_dtype[vv] for vv in vars_to_dims)
     for dd in all_dims:
-        L = ds.coords[dd].values.tolist()
-        assert len(L) >= min_side
-        assert (max_side is None) or (len(L) <= max_side)
-        assert all(isinstance(ss, int) for ss in L)
-        assert L == list(range(len(L)))
+        X = _coord_values(ds, dd)
+        assert len(X) >= min_side
+        assert (max_side is None) or (len(X) <= max_side)
+        assert _is_int_array(X)
+        assert np.array_equal(X, np.arange(len(X)))
 
 
-@given(dtypes(), sizes(allow_none=False), sizes(allow_none=False), sizes(allow_none=False), data())
+@given(_DTYPES, _SIZES_NO_NONE, _SIZES_NO_NONE, _SIZES_NO_NONE, data())
 def test_datasets(dtype, size_sides, size_vars, size_dims, data):
     elements = None
     coords_elements = None
@@ -393,17 +478,19 @@ def test_datasets(dtype, size_sides, size_vars, size_dims, data):
 
     ds = data.draw(S)
 
-    all_dims = sorted(set(sum((list(ds[vv].dims) for vv in ds), [])))
+    variables = ds.variables
+    all_dims = sorted(set(chain.from_iterable(variables[vv].dims for vv in ds)))
 
     n = len(list(ds))
     assert n >= min_vars
     assert (max_vars is None) or (n <= max_vars)
-    assert all(len(ds[vv].dims) >= min_dims for vv in ds)
-    assert (max_dims is None) or all(len(ds[vv].dims) <= max_dims for vv in ds)
-    assert all(ds[vv].dtype == np.dtype(dtype) for vv in ds)
+    assert all(len(variables[vv].dims) >= min_dims for vv in ds)
+    assert (max_dims is None) or all(len(variables[vv].dims) <= max_dims for vv in ds)
+    expected_dtype = np.dtype(dtype)
+    assert all(variables[vv].dtype == expected_dtype for vv in ds)
     for dd in all_dims:
-        L = ds.coords[dd].values.tolist()
-        assert len(L) >= min_side
-        assert (max_side is None) or (len(L) <= max_side)
-        assert all(isinstance(ss, int) for ss in L)
-        assert len(set(L)) == len(L)
+        X = _coord_values(ds, dd)
+        assert len(X) >= min_side
+        assert (max_side is None) or (len(X) <= max_side)
+        assert _is_int_array(X)
+        assert np.unique(X).size == X.size